@@ -1,20 +1,50 @@
 import os
-from qdrant_client import QdrantClient
-from qdrant_client.http import models
+import hashlib
 from typing import List, Dict, Any, Optional
 import uuid
+import threading
+from functools import lru_cache
+from utils import format_context
+
+# qdrant_client is imported lazily inside the functions below so that
+# importing this module (and starting the API) stays cheap.
 
 COLLECTION_NAME = "qa_agent_docs"
+DEFAULT_VECTOR_SIZE = 768
+
+# (url, api_key, vector_size) tuples whose collection is known to exist.
+_ready_collections = set()
+_client_lock = threading.Lock()
 
 def get_client(url: str, api_key: str):
+    # Normalise "" and None so both resolve to the same cached client. The lock
+    # stops concurrent first calls from each building their own ":memory:" store.
+    with _client_lock:
+        return _cached_client(url or None, api_key or None)
+
+@lru_cache(maxsize=8)
+def _cached_client(url: Optional[str], api_key: Optional[str]):
+    # Cached so every call shares one client; this also keeps the ":memory:"
+    # store alive between ingest and search instead of starting empty each time.
+    from qdrant_client import QdrantClient
+
     if not url:
         print("Warning: QDRANT_URL not provided. Using in-memory storage.")
         return QdrantClient(":memory:")
     return QdrantClient(url=url, api_key=api_key)
 
-def ensure_collection(url: str, api_key: str):
-    """Ensures the collection exists."""
+def ensure_collection(url: str, api_key: str, vector_size: int = DEFAULT_VECTOR_SIZE):
+    """
+    Ensures the collection exists with the given vector size.
+    Raises ValueError if it already exists with a different size.
+    """
+    cache_key = (url or None, api_key or None, vector_size)
+    if cache_key in _ready_collections:
+        return
+    from qdrant_client.http import models
+
     client = get_client(url, api_key)
+    mismatched_size = None
     try:
         collections = client.get_collections().collections
         exists = any(c.name == COLLECTION_NAME for c in collections)
@@ -22,23 +52,46 @@ def ensure_collection(url: str, api_key: str):
         if not exists:
             client.create_collection(
                 collection_name=COLLECTION_NAME,
-                vectors_config=models.VectorParams(size=768, distance=models.Distance.COSINE)
+                vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE)
             )
+        else:
+            existing_size = client.get_collection(COLLECTION_NAME).config.params.vectors.size
+            if existing_size != vector_size:
+                mismatched_size = existing_size
+        if mismatched_size is None:
+            _ready_collections.add(cache_key)
     except Exception as e:
         print(f"Error ensuring collection: {e}")
         pass
 
+    if mismatched_size is not None:
+        raise ValueError(
+            f"Collection '{COLLECTION_NAME}' stores {mismatched_size}-dim vectors but the embedding backend "
+            f"produces {vector_size}-dim vectors. Switch EMBEDDING_BACKEND back or recreate the collection."
+        )
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def point_id(payload: Dict[str, Any]) -> str:
+    """Deterministic id per (filename, content), so re-ingesting a file overwrites it instead of duplicating."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{payload.get('filename', '')}:{payload['content_hash']}"))
+
 def upsert_documents(documents: List[Dict[str, Any]], embeddings: List[List[float]], url: str, api_key: str):
     """Upserts documents with their embeddings."""
-    ensure_collection(url, api_key)
+    from qdrant_client.http import models
+
+    ensure_collection(url, api_key, len(embeddings[0]) if embeddings else DEFAULT_VECTOR_SIZE)
     client = get_client(url, api_key)
     
     points = []
     for doc, emb in zip(documents, embeddings):
+        payload = dict(doc)
+        payload.setdefault("content_hash", content_hash(payload.get("content", "")))
         points.append(models.PointStruct(
-            id=str(uuid.uuid4()),
+            id=point_id(payload),
             vector=emb,
-            payload=doc
+            payload=payload
         ))
     
     try:
@@ -51,14 +104,12 @@ def upsert_documents(documents: List[Dict[str, Any]], embeddings: List[List[floa
         print(f"Error upserting documents: {e}")
         raise e
 
-def search_documents(query_vector: List[float], url: str, api_key: str, limit: int = 5) -> str:
-    """Searches for relevant documents and returns combined text."""
-    ensure_collection(url, api_key)
+def search_document_chunks(query_vector: List[float], url: str, api_key: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """Searches for relevant documents and returns their payloads, best match first."""
+    ensure_collection(url, api_key, len(query_vector))
     client = get_client(url, api_key)
     
     try:
-        from qdrant_client.models import QueryRequest
-        
         results = client.query_points(
             collection_name=COLLECTION_NAME,
             query=query_vector,
@@ -69,9 +120,56 @@ def search_documents(query_vector: List[float], url: str, api_key: str, limit: i
         print(f"Error during Qdrant search: {e}")
         raise e
     
-    context = ""
-    for res in results:
-        context += f"\n--- Source: {res.payload.get('filename', 'Unknown')} ---\n"
-        context += res.payload.get('content', '')
-    
-    return context
+    return [res.payload for res in results]
+
+def search_documents(query_vector: List[float], url: str, api_key: str, limit: int = 5) -> str:
+    """Searches for relevant documents and returns combined text."""
+    return format_context(search_document_chunks(query_vector, url, api_key, limit))
+
+def count_points(url: str, api_key: str) -> int:
+    """Returns the number of stored points, or 0 if the collection does not exist yet."""
+    client = get_client(url, api_key)
+    if not client.collection_exists(COLLECTION_NAME):
+        return 0
+    return client.count(collection_name=COLLECTION_NAME, exact=True).count
+
+def export_points(url: str, api_key: str, batch_size: int = 256):
+    """Yields batches of (ids, vectors, payloads) for every point in the collection."""
+    client = get_client(url, api_key)
+    if not client.collection_exists(COLLECTION_NAME):
+        return
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=COLLECTION_NAME,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        if points:
+            yield [str(p.id) for p in points], [p.vector for p in points], [p.payload for p in points]
+        if offset is None:
+            break
+
+def import_points(ids: List[str], vectors, payloads: List[Dict[str, Any]], url: str, api_key: str, batch_size: int = 512):
+    """Bulk-loads precomputed points; `vectors` may be any 2-D array-like (e.g. a memory-mapped NumPy array)."""
+    from qdrant_client.http import models
+
+    if not ids:
+        return
+    ensure_collection(url, api_key, len(vectors[0]))
+    client = get_client(url, api_key)
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        chunk = vectors[start:end]
+        client.upsert(
+            collection_name=COLLECTION_NAME,
+            points=models.Batch(
+                ids=ids[start:end],
+                vectors=chunk.tolist() if hasattr(chunk, "tolist") else [list(v) for v in chunk],
+                payloads=payloads[start:end]
+            ),
+            wait=True
+        )
+    print(f"Successfully imported {len(ids)} points.")
@@ -0,0 +1,149 @@
+"""
+Near-duplicate detection for generated test cases.
+
+Test cases are embedded in one batch, grouped by cosine similarity (greedy
+leader clustering, vectorised with NumPy) and each cluster is merged into its
+first member, so script generation and execution scale with unique coverage.
+
+The whole suite is re-sent with every request, so vectors are cached by text
+and only new or edited test cases are embedded.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+DEFAULT_THRESHOLD = 0.92
+VECTOR_CACHE_SIZE = 2048
+
+# (backend name, dim, text) -> float32 vector, least recently used first.
+_vector_cache: "OrderedDict[Tuple[str, int, str], Any]" = OrderedDict()
+_vector_cache_lock = threading.Lock()
+
+_ID_RE = re.compile(r"^TC(\d+)$")
+
+
+def test_case_text(test_case: Dict[str, Any]) -> str:
+    """Text used to compare test cases: description, steps and expected result."""
+    steps = " ".join(test_case.get("steps", []))
+    return f"{test_case.get('description', '')}\n{steps}\n{test_case.get('expected_result', '')}"
+
+
+def embed_test_cases(test_cases: List[Dict[str, Any]], backend, api_key: str = None) -> List[Any]:
+    """
+    Returns one vector per test case, embedding only texts missing from the
+    cache in a single batch. Failed embeddings come back empty and are not cached.
+    """
+    import numpy as np
+
+    keys = [(backend.name, backend.dim, test_case_text(tc)) for tc in test_cases]
+    found = {}
+    with _vector_cache_lock:
+        for key in keys:
+            if key in _vector_cache:
+                _vector_cache.move_to_end(key)
+                found[key] = _vector_cache[key]
+
+    missing = list(dict.fromkeys(key for key in keys if key not in found))
+    if missing:
+        vectors = backend.embed([text for _, _, text in missing], api_key)
+        with _vector_cache_lock:
+            for key, vector in zip(missing, vectors):
+                if not len(vector):
+                    found[key] = []
+                    continue
+                found[key] = _vector_cache[key] = np.asarray(vector, dtype=np.float32)
+                while len(_vector_cache) > VECTOR_CACHE_SIZE:
+                    _vector_cache.popitem(last=False)
+    return [found[key] for key in keys]
+
+
+def assign_unique_ids(test_cases: List[Dict[str, Any]], taken: List[str] = ()) -> List[Dict[str, Any]]:
+    """Returns copies of `test_cases`, renaming any id already in `taken` (or repeated) to the next free TC###."""
+    used = set(taken)
+    next_number = max([int(m.group(1)) for m in map(_ID_RE.match, used) if m] + [0]) + 1
+    renamed = []
+    for tc in test_cases:
+        tc = dict(tc)
+        if not tc.get("id") or tc["id"] in used:
+            while f"TC{next_number:03d}" in used:
+                next_number += 1
+            tc["id"] = f"TC{next_number:03d}"
+        used.add(tc["id"])
+        match = _ID_RE.match(tc["id"])
+        if match:
+            next_number = max(next_number, int(match.group(1)) + 1)
+        renamed.append(tc)
+    return renamed
+
+
+def cluster_by_similarity(vectors: List[List[float]], threshold: float) -> List[int]:
+    """
+    Assigns each vector a cluster label. Vectors are visited in order; each
+    unassigned one leads a new cluster that absorbs every later unassigned
+    vector with cosine similarity >= threshold. Empty vectors stay singletons.
+    """
+    import numpy as np
+
+    n = len(vectors)
+    dim = max((len(v) for v in vectors), default=0)
+    matrix = np.zeros((n, dim), dtype=np.float32)
+    for i, v in enumerate(vectors):
+        if len(v):
+            matrix[i] = v
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1.0, norms)
+
+    labels = np.full(n, -1, dtype=np.intp)
+    cluster = 0
+    for i in range(n):
+        if labels[i] != -1:
+            continue
+        labels[i] = cluster
+        if norms[i, 0] > 0:
+            similar = (matrix @ matrix[i] >= threshold) & (labels == -1)
+            labels[similar] = cluster
+        cluster += 1
+    return labels.tolist()
+
+
+def _merge(members: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Keeps the first member and unions the grounded_in sources of the rest."""
+    merged = dict(members[0])
+    sources = []
+    for tc in members:
+        for source in str(tc.get("grounded_in", "")).split(","):
+            source = source.strip()
+            if source and source not in sources:
+                sources.append(source)
+    merged["grounded_in"] = ", ".join(sources)
+    return merged
+
+
+def deduplicate_test_cases(
+    test_cases: List[Dict[str, Any]],
+    vectors: List[List[float]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> Tuple[List[Dict[str, Any]], Dict[str, List[str]]]:
+    """
+    Merges near-duplicate test cases. `vectors[i]` is the embedding of
+    `test_case_text(test_cases[i])`; ids must be unique.
+
+    Returns the unique test cases (in original order) and a mapping from each
+    kept id to the ids merged into it, itself included.
+    """
+    if not test_cases:
+        return [], {}
+
+    labels = cluster_by_similarity(vectors, threshold)
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    for label, tc in zip(labels, test_cases):
+        groups.setdefault(label, []).append(tc)
+
+    unique = []
+    clusters = {}
+    for members in groups.values():
+        merged = _merge(members)
+        unique.append(merged)
+        clusters[merged["id"]] = [tc["id"] for tc in members]
+    return unique, clusters
@@ -0,0 +1,116 @@
+"""
+Pluggable embedding backends.
+
+Select one with EMBEDDING_BACKEND:
+- "gemini" (default): remote text-embedding-004, 768 dimensions.
+- "hashing": local CPU feature-hashing embedder (NumPy), fully offline.
+  Dimension is set with EMBEDDING_DIM (default 512).
+
+The Qdrant collection is created with the dimension of the selected backend.
+"""
+import abc
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import List, Optional
+
+from scheduler import INTERACTIVE
+
+
+class EmbeddingBackend(abc.ABC):
+    name = ""
+    dim = 0
+    requires_api_key = False
+
+    @abc.abstractmethod
+    def embed(self, texts: List[str], api_key: Optional[str] = None, priority: int = INTERACTIVE) -> List[List[float]]:
+        """
+        Returns one vector per text. An empty list marks a text that could not
+        be embedded; callers skip it.
+        """
+
+    def warm_up(self):
+        """Loads anything the backend needs before the first request."""
+
+
+class GeminiEmbeddingBackend(EmbeddingBackend):
+    name = "gemini"
+    dim = 768
+    requires_api_key = True
+
+    def embed(self, texts, api_key=None, priority=INTERACTIVE):
+        import llm_service
+        return llm_service.get_embeddings(texts, api_key, priority)
+
+    def warm_up(self):
+        import llm_service
+        llm_service.load_sdk()
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=65536)
+def _hash_feature(feature: str, dim: int):
+    # crc32 is stable across processes (unlike hash()), so vectors stored in
+    # Qdrant or snapshots stay valid after a restart.
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Signed feature hashing over word unigrams and bigrams with sublinear term
+    frequency and L2 normalisation. Cheap, deterministic and dependency-light;
+    captures lexical rather than semantic similarity.
+    """
+    name = "hashing"
+
+    def __init__(self, dim: int = 512, batch_size: int = 256):
+        self.dim = dim
+        self.batch_size = batch_size
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def _embed_batch(self, texts: List[str]):
+        import numpy as np
+
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                col, sign = _hash_feature(feature, self.dim)
+                rows.append(row)
+                cols.append(col)
+                signs.append(sign)
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)),
+                  np.asarray(signs, dtype=np.float32))
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        return matrix
+
+    def embed(self, texts, api_key=None, priority=INTERACTIVE):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            matrix = self._embed_batch(texts[start:start + self.batch_size])
+            # Texts without any tokens give a zero vector, which cosine search can't use.
+            vectors.extend(row.tolist() if row.any() else [] for row in matrix)
+        return vectors
+
+    def warm_up(self):
+        self.embed(["warm up"])
+
+
+@lru_cache(maxsize=1)
+def get_backend() -> EmbeddingBackend:
+    name = os.environ.get("EMBEDDING_BACKEND", "gemini").lower()
+    if name == "gemini":
+        return GeminiEmbeddingBackend()
+    if name == "hashing":
+        return HashingEmbeddingBackend(dim=int(os.environ.get("EMBEDDING_DIM", 512)))
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{name}'. Expected 'gemini' or 'hashing'.")
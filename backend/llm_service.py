@@ -1,35 +1,64 @@
 import os
-from google import genai
-from google.genai import types
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from models import TestCase
 from functools import lru_cache
-from utils import clean_html_for_llm
+from utils import clean_html_for_llm, format_context
+from concurrent.futures import ThreadPoolExecutor
+from scheduler import scheduler, RetriesExhausted, INTERACTIVE
 import re
 
+EMBEDDING_MODEL = "text-embedding-004"
+GENERATION_MODEL = "gemini-2.5-flash"
+
+@lru_cache(maxsize=8)
 def get_client(api_key: str):
     if not api_key:
         raise ValueError("Gemini API Key is required")
+    # Imported lazily: the SDK is slow to import and not every request needs it.
+    from google import genai
     return genai.Client(api_key=api_key)
 
-def get_embedding(text: str, api_key: str) -> List[float]:
-    """Generates embedding for the given text."""
-    try:
-        client = get_client(api_key)
-        response = client.models.embed_content(
-            model="text-embedding-004",
-            contents=text
-        )
-        if response.embeddings and len(response.embeddings) > 0:
-            return response.embeddings[0].values
-        return []
-    except Exception as e:
-        print(f"Error generating embedding: {e}")
-        return []
+def load_sdk():
+    """Imports the Gemini SDK ahead of the first request (used by startup warm-up)."""
+    from google import genai
+    from google.genai import types
+
+def get_embeddings(texts: List[str], api_key: str, priority: int = INTERACTIVE, batch_size: int = 100) -> List[List[float]]:
+    """
+    Embeds many texts using batched embed_content calls.
+    Returns [] for texts in a batch that failed; raises RetriesExhausted if still failing after retries.
+    """
+    client = get_client(api_key)
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        try:
+            response = scheduler.call(
+                api_key,
+                EMBEDDING_MODEL,
+                lambda: client.models.embed_content(
+                    model=EMBEDDING_MODEL,
+                    contents=batch
+                ),
+                priority=priority,
+                coalesce_key=("embed_batch", tuple(batch))
+            )
+            values = [e.values for e in (response.embeddings or [])]
+            if len(values) != len(batch):
+                raise ValueError(f"expected {len(batch)} embeddings, got {len(values)}")
+            vectors.extend(values)
+        except RetriesExhausted:
+            raise
+        except Exception as e:
+            print(f"Error generating embeddings: {e}")
+            vectors.extend([] for _ in batch)
+    return vectors
 
 def generate_test_cases(context: str, api_key: str) -> List[Dict[str, Any]]:
     """Generates test cases based on the provided context."""
+    from google.genai import types
+
     client = get_client(api_key)
     prompt = f"""
     You are an expert QA Engineer. Based on the following documentation and UI guides, generate a list of comprehensive test cases.
@@ -55,13 +84,18 @@ def generate_test_cases(context: str, api_key: str) -> List[Dict[str, Any]]:
     """
     
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", 
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=list[TestCase]
-            )
+        response = scheduler.call(
+            api_key,
+            GENERATION_MODEL,
+            lambda: client.models.generate_content(
+                model=GENERATION_MODEL,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=list[TestCase]
+                )
+            ),
+            coalesce_key=("tests", prompt)
         )
         
         if response.text:
@@ -88,10 +122,113 @@ def generate_test_cases(context: str, api_key: str) -> List[Dict[str, Any]]:
                 return []
             
         return []
+    except RetriesExhausted:
+        raise
     except Exception as e:
         print(f"Error generating test cases: {e}")
         return []
 
+def _split_text(text: str, max_chars: int) -> List[str]:
+    """Splits text into pieces of at most max_chars, preferring line and then word boundaries."""
+    max_chars = max(1, max_chars)
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind("\n", 0, max_chars)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+def group_documents(documents: List[Dict[str, Any]], max_chars: int) -> List[List[Dict[str, Any]]]:
+    """
+    Packs documents into groups of roughly max_chars of content. Oversized
+    documents are split into chunks that keep their filename.
+    """
+    groups = []
+    current = []
+    size = 0
+    for doc in documents:
+        for piece in _split_text(doc.get("content", ""), max_chars):
+            if current and size + len(piece) > max_chars:
+                groups.append(current)
+                current, size = [], 0
+            current.append({"filename": doc.get("filename", "Unknown"), "content": piece})
+            size += len(piece)
+    if current:
+        groups.append(current)
+    return groups
+
+def single_wave_chunk_chars(documents: List[Dict[str, Any]], max_chars: int, max_workers: int) -> int:
+    """
+    Returns a group size of at least max_chars for which the documents pack
+    into at most max_workers groups, so every map call runs in one parallel
+    wave. A second wave would cost a full generation round trip and make
+    map-reduce slower than a single prompt.
+    """
+    max_workers = max(1, max_workers)
+    total = sum(len(doc.get("content", "")) for doc in documents)
+    size = max(1, max_chars, -(-total // max_workers))
+    # Packing at document and line boundaries can leave groups short of the
+    # size, so grow it until the groups fit.
+    while len(group_documents(documents, size)) > max_workers:
+        size += max(1, size // 4)
+    return size
+
+def generate_test_cases_map_reduce(
+    documents: List[Dict[str, Any]],
+    api_key: str,
+    max_chars: int = 8000,
+    max_workers: int = 4
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Map: generates test cases for each document group in parallel (bounded by
+    max_workers; the scheduler still applies rate limits).
+    Reduce: concatenates the results, fills missing grounded_in from the
+    group's sources and renumbers ids TC001, TC002, ...
+    Returns the test cases and a label for each group that was rate limited
+    or produced no test cases. Raises RetriesExhausted only if every group
+    ran out of retries.
+    """
+    groups = group_documents(documents, max_chars)
+    if not groups:
+        return [], []
+
+    def run(group):
+        try:
+            return generate_test_cases(format_context(group), api_key), None
+        except RetriesExhausted as e:
+            return [], e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as pool:
+        results = list(pool.map(run, groups))
+
+    errors = [error for _, error in results if error is not None]
+    if errors and len(errors) == len(groups):
+        raise errors[0]
+
+    merged = []
+    failed_groups = []
+    for group, (cases, error) in zip(groups, results):
+        sources = ", ".join(dict.fromkeys(doc["filename"] for doc in group))
+        if error is not None:
+            failed_groups.append(f"{sources} (retries exhausted)")
+        elif not cases:
+            failed_groups.append(f"{sources} (no test cases returned)")
+        for tc in cases:
+            tc = dict(tc)
+            if not tc.get("grounded_in"):
+                tc["grounded_in"] = sources
+            merged.append(tc)
+    for i, tc in enumerate(merged, start=1):
+        tc["id"] = f"TC{i:03d}"
+    print(f"Map-reduce generated {len(merged)} test cases from {len(groups)} groups ({len(failed_groups)} failed).")
+    return merged, failed_groups
+
 def generate_selenium_script(test_case: TestCase, html_content: str, api_key: str) -> str:
     """Generates a Selenium script for a specific test case."""
     client = get_client(api_key)
@@ -200,9 +337,14 @@ def generate_selenium_script(test_case: TestCase, html_content: str, api_key: st
     """
     
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+        response = scheduler.call(
+            api_key,
+            GENERATION_MODEL,
+            lambda: client.models.generate_content(
+                model=GENERATION_MODEL,
+                contents=prompt
+            ),
+            coalesce_key=("script", prompt)
         )
         
         text = response.text
@@ -214,6 +356,8 @@ def generate_selenium_script(test_case: TestCase, html_content: str, api_key: st
             text = text[:-3]
             
         return text.strip()
+    except RetriesExhausted:
+        raise
     except Exception as e:
         print(f"Error generating script: {e}")
         return f"# Error generating script: {str(e)}"
@@ -1,5 +1,11 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
-from fastapi import FastAPI, UploadFile, File, HTTPException, Header
+import asyncio
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
 from typing import List, Optional
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
@@ -11,19 +17,101 @@ from models import (
     TestGenerationRequest, 
     TestGenerationResponse, 
     ScriptGenerationRequest, 
-    ScriptGenerationResponse
+    ScriptGenerationResponse,
+    SnapshotImportResponse
 )
-from utils import parse_file_content
+from utils import parse_file_content, warm_up_parsers, format_context
+from scheduler import BULK, RetriesExhausted
 import database
+import dedup
+import embeddings
 import llm_service
+import snapshot
+
+# Startup timings, reported on /health and in the logs.
+startup_metrics = {
+    "import_seconds": time.perf_counter() - _IMPORT_STARTED,
+    "startup_seconds": None,
+    "warmup_seconds": None,
+    "snapshot_seconds": None,
+    "first_request_path": None,
+    "first_request_ms": None,
+}
+
+def warm_up():
+    """Loads parsers, the embedding backend, the Gemini SDK/client and the Qdrant collection ahead of the first request."""
+    started = time.perf_counter()
+    # Ordered by what every request needs first: a request that arrives mid
+    # warm-up blocks on the import lock of whichever module is loading.
+    steps = [
+        ("qdrant", lambda: database.ensure_collection(
+            os.environ.get("QDRANT_URL"), os.environ.get("QDRANT_API_KEY"), embeddings.get_backend().dim)),
+        ("embeddings", lambda: embeddings.get_backend().warm_up()),
+        ("gemini", lambda: llm_service.get_client(os.environ["GEMINI_API_KEY"])
+            if os.environ.get("GEMINI_API_KEY") else llm_service.load_sdk()),
+        ("parsers", warm_up_parsers),
+    ]
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            print(f"Warm-up step '{name}' failed: {e}")
+    startup_metrics["warmup_seconds"] = time.perf_counter() - started
+    print(f"Warm-up finished in {startup_metrics['warmup_seconds']:.2f}s")
+
+def load_startup_snapshot():
+    """Bulk-loads SNAPSHOT_PATH into an empty collection so no re-ingestion is needed."""
+    started = time.perf_counter()
+    url = os.environ.get("QDRANT_URL")
+    key = os.environ.get("QDRANT_API_KEY")
+    try:
+        if database.count_points(url, key) > 0:
+            print("Collection already populated; skipping startup snapshot.")
+            return
+        manifest = snapshot.import_snapshot(os.environ["SNAPSHOT_PATH"], url, key)
+        startup_metrics["snapshot_seconds"] = time.perf_counter() - started
+        print(f"Loaded snapshot with {manifest['count']} points in {startup_metrics['snapshot_seconds']:.2f}s")
+    except Exception as e:
+        print(f"Error loading startup snapshot: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Starting QA Agent Backend...")
+    background_tasks = []
+    # Both run in the background so the server starts accepting requests immediately.
+    if os.environ.get("PREWARM_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+        background_tasks.append(asyncio.create_task(run_in_threadpool(warm_up)))
+    if os.environ.get("SNAPSHOT_PATH"):
+        background_tasks.append(asyncio.create_task(run_in_threadpool(load_startup_snapshot)))
+    startup_metrics["startup_seconds"] = time.perf_counter() - _IMPORT_STARTED
+    print(f"Backend ready in {startup_metrics['startup_seconds']:.2f}s (imports: {startup_metrics['import_seconds']:.2f}s)")
     yield
+    for task in background_tasks:
+        if not task.done():
+            task.cancel()
     print("Shutting down QA Agent Backend...")
 
 app = FastAPI(title="Autonomous QA Agent API", lifespan=lifespan)
+# Generated scripts and test suites compress well; the frontend sends Accept-Encoding: gzip.
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    # Health checks are excluded so the metric reflects the first real API call.
+    if startup_metrics["first_request_ms"] is not None or request.url.path == "/health":
+        return await call_next(request)
+    started = time.perf_counter()
+    response = await call_next(request)
+    if startup_metrics["first_request_ms"] is None:
+        startup_metrics["first_request_path"] = request.url.path
+        startup_metrics["first_request_ms"] = (time.perf_counter() - started) * 1000
+        print(f"First request {request.url.path} took {startup_metrics['first_request_ms']:.1f}ms")
+    return response
+
+@app.get("/health")
+async def health():
+    """Liveness check that also reports startup and first-request timings."""
+    return {"status": "ok", "startup": startup_metrics}
 
 @app.post("/ingest", response_model=IngestResponse)
 async def ingest_files(
@@ -39,43 +127,70 @@ async def ingest_files(
     qdrant_url = x_qdrant_url or os.environ.get("QDRANT_URL")
     qdrant_key = x_qdrant_api_key or os.environ.get("QDRANT_API_KEY")
 
-    if not gemini_key:
+    backend = embeddings.get_backend()
+    if backend.requires_api_key and not gemini_key:
         raise HTTPException(status_code=400, detail="Gemini API Key is required (header or env var)")
 
-    processed_count = 0
+    parsed = []
     documents = []
-    embeddings = []
+    vectors = []
+    skipped_files = []
+    retry_error = None
 
     for file in files:
         try:
             content = await file.read()
-            text_content = parse_file_content(file.filename, content)
-            
-            embedding = llm_service.get_embedding(text_content, gemini_key)
-            if not embedding:
-                print(f"Skipping {file.filename}: Failed to generate embedding.")
-                continue
-                
-            documents.append({
-                "filename": file.filename,
-                "content": text_content
-            })
-            embeddings.append(embedding)
-            processed_count += 1
-            
+            parsed.append((file.filename, parse_file_content(file.filename, content)))
         except Exception as e:
             print(f"Error processing {file.filename}: {e}")
+            skipped_files.append(file.filename)
+
+    try:
+        # Embed all files in one batched call; remote backends block (and may
+        # back off), so keep this off the event loop.
+        batch_vectors = await run_in_threadpool(backend.embed, [text for _, text in parsed], gemini_key, BULK)
+    except RetriesExhausted as e:
+        print(f"Skipping {len(parsed)} file(s): {e}")
+        batch_vectors = [[] for _ in parsed]
+        retry_error = e
+
+    for (filename, text_content), vector in zip(parsed, batch_vectors):
+        if not vector:
+            print(f"Skipping {filename}: Failed to generate embedding.")
+            skipped_files.append(filename)
             continue
+        documents.append({
+            "filename": filename,
+            "content": text_content,
+            "embedding_backend": backend.name
+        })
+        vectors.append(vector)
+    processed_count = len(documents)
 
     if not documents:
+        if retry_error is not None:
+            raise HTTPException(status_code=retry_error.status_code, detail=f"No files were processed; retry later. {retry_error}")
         raise HTTPException(status_code=400, detail="No files were successfully processed.")
 
     try:
-        database.upsert_documents(documents, embeddings, qdrant_url, qdrant_key)
+        database.upsert_documents(documents, vectors, qdrant_url, qdrant_key)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-    return IngestResponse(message="Ingestion successful", files_processed=processed_count)
+    return IngestResponse(message="Ingestion successful", files_processed=processed_count, skipped_files=skipped_files)
+
+def dedupe_suite(existing: List[dict], new: List[dict], threshold: float, gemini_key: str):
+    """Merges near-duplicates across the existing suite plus newly generated test cases."""
+    suite = existing + dedup.assign_unique_ids(new, [tc["id"] for tc in existing])
+    if threshold >= 1.0 or len(suite) < 2:
+        return suite, {tc["id"]: [tc["id"]] for tc in suite}
+    try:
+        vectors = dedup.embed_test_cases(suite, embeddings.get_backend(), gemini_key)
+    except RetriesExhausted as e:
+        # Deduplication is an optimisation; return the suite unmerged rather than failing the request.
+        print(f"Skipping test case deduplication: {e}")
+        return suite, {tc["id"]: [tc["id"]] for tc in suite}
+    return dedup.deduplicate_test_cases(suite, vectors, threshold)
 
 @app.post("/generate-tests", response_model=TestGenerationResponse)
 async def generate_tests(
@@ -84,7 +199,10 @@ async def generate_tests(
     x_qdrant_url: Optional[str] = Header(None),
     x_qdrant_api_key: Optional[str] = Header(None)
 ):
-    """Generates test cases based on a user query using RAG."""
+    """
+    Generates test cases based on a user query using RAG, then merges
+    near-duplicates across the request's existing suite and the new cases.
+    """
     
     gemini_key = x_gemini_api_key or os.environ.get("GEMINI_API_KEY")
     qdrant_url = x_qdrant_url or os.environ.get("QDRANT_URL")
@@ -94,15 +212,47 @@ async def generate_tests(
         raise HTTPException(status_code=400, detail="Gemini API Key is required")
 
     try:
-        query_embedding = llm_service.get_embedding(request.query, gemini_key)
+        query_vectors = await run_in_threadpool(embeddings.get_backend().embed, [request.query], gemini_key)
+        query_embedding = query_vectors[0] if query_vectors else []
         if not query_embedding:
             raise HTTPException(status_code=500, detail="Failed to embed query.")
 
-        context = database.search_documents(query_embedding, qdrant_url, qdrant_key, limit=3)
-        test_cases = llm_service.generate_test_cases(context, gemini_key)
+        documents = await run_in_threadpool(
+            database.search_document_chunks, query_embedding, qdrant_url, qdrant_key, request.top_k)
+        context = format_context(documents)
+
+        mode = request.mode
+        chunk_chars = max(1, int(os.environ.get("MAP_REDUCE_CHUNK_CHARS", 8000)))
+        max_workers = max(1, int(os.environ.get("MAP_REDUCE_MAX_WORKERS", 4)))
+        if mode == "auto":
+            mode = "map_reduce" if len(context) > int(os.environ.get("MAP_REDUCE_THRESHOLD_CHARS", 12000)) else "single"
+            if mode == "map_reduce":
+                # Groups beyond max_workers would run in a second wave and lose to a single prompt.
+                chunk_chars = llm_service.single_wave_chunk_chars(documents, chunk_chars, max_workers)
+        failed_groups = []
+        if mode == "map_reduce":
+            test_cases, failed_groups = await run_in_threadpool(
+                llm_service.generate_test_cases_map_reduce,
+                documents,
+                gemini_key,
+                chunk_chars,
+                max_workers
+            )
+        else:
+            test_cases = await run_in_threadpool(llm_service.generate_test_cases, context, gemini_key)
+
+        threshold = request.dedup_threshold
+        if threshold is None:
+            threshold = float(os.environ.get("DEDUP_THRESHOLD", dedup.DEFAULT_THRESHOLD))
+        existing = [tc.model_dump() for tc in request.existing_test_cases]
+        suite, clusters = await run_in_threadpool(dedupe_suite, existing, test_cases, threshold, gemini_key)
         
-        return TestGenerationResponse(test_cases=test_cases)
+        return TestGenerationResponse(test_cases=suite, clusters=clusters, failed_groups=failed_groups)
         
+    except HTTPException:
+        raise
+    except RetriesExhausted as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         print(f"ERROR in /generate-tests: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -119,12 +269,62 @@ async def generate_script(
         raise HTTPException(status_code=400, detail="Gemini API Key is required")
 
     try:
-        script = llm_service.generate_selenium_script(request.test_case, request.html_content, gemini_key)
+        script = await run_in_threadpool(llm_service.generate_selenium_script, request.test_case, request.html_content, gemini_key)
         return ScriptGenerationResponse(script_code=script)
+    except RetriesExhausted as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         print(f"ERROR in /generate-script: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/snapshot")
+async def export_snapshot(
+    x_qdrant_url: Optional[str] = Header(None),
+    x_qdrant_api_key: Optional[str] = Header(None)
+):
+    """Exports all stored documents and their vectors as a snapshot zip."""
+    
+    qdrant_url = x_qdrant_url or os.environ.get("QDRANT_URL")
+    qdrant_key = x_qdrant_api_key or os.environ.get("QDRANT_API_KEY")
+
+    try:
+        data = await run_in_threadpool(snapshot.export_archive, qdrant_url, qdrant_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"ERROR in /snapshot export: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return Response(
+        content=data,
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="qa_agent_snapshot.zip"'}
+    )
+
+@app.post("/snapshot", response_model=SnapshotImportResponse)
+async def import_snapshot(
+    file: UploadFile = File(...),
+    x_qdrant_url: Optional[str] = Header(None),
+    x_qdrant_api_key: Optional[str] = Header(None)
+):
+    """Bulk-loads a snapshot zip produced by GET /snapshot; no embedding calls are made."""
+    
+    qdrant_url = x_qdrant_url or os.environ.get("QDRANT_URL")
+    qdrant_key = x_qdrant_api_key or os.environ.get("QDRANT_API_KEY")
+
+    data = await file.read()
+    try:
+        manifest = await run_in_threadpool(snapshot.import_archive, data, qdrant_url, qdrant_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"ERROR in /snapshot import: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return SnapshotImportResponse(
+        message="Snapshot imported",
+        points_imported=manifest["count"],
+        embedding_backend=manifest["embedding_backend"]
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,9 +1,10 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 
 class IngestResponse(BaseModel):
     message: str
     files_processed: int
+    skipped_files: List[str] = Field(default_factory=list, description="Files that could not be parsed or embedded")
 
 class TestCase(BaseModel):
     id: str
@@ -16,9 +17,18 @@ class TestCase(BaseModel):
 
 class TestGenerationRequest(BaseModel):
     query: str
+    top_k: int = Field(default=3, ge=1, le=50, description="Number of documents to retrieve")
+    mode: Literal["auto", "single", "map_reduce"] = Field(
+        default="auto",
+        description="'single' sends one prompt; 'map_reduce' generates per document group in parallel; 'auto' picks map_reduce for large contexts"
+    )
+    existing_test_cases: List[TestCase] = Field(default_factory=list, description="Session suite to deduplicate new test cases against")
+    dedup_threshold: Optional[float] = Field(default=None, ge=0.0, le=1.0, description="Cosine similarity above which test cases are merged; 1.0 disables merging")
 
 class TestGenerationResponse(BaseModel):
     test_cases: List[TestCase]
+    clusters: Dict[str, List[str]] = Field(default_factory=dict, description="Kept test case id -> ids merged into it (itself included)")
+    failed_groups: List[str] = Field(default_factory=list, description="Map-reduce document groups that were rate limited or returned no test cases")
 
 class ScriptGenerationRequest(BaseModel):
     test_case: TestCase
@@ -26,3 +36,8 @@ class ScriptGenerationRequest(BaseModel):
 
 class ScriptGenerationResponse(BaseModel):
     script_code: str
+
+class SnapshotImportResponse(BaseModel):
+    message: str
+    points_imported: int
+    embedding_backend: str
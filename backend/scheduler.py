@@ -0,0 +1,238 @@
+"""
+Shared scheduler for outbound Gemini calls.
+
+- Token-bucket rate limits per (API key, model).
+- Priorities: interactive calls are served before bulk ingestion when the
+  bucket is empty.
+- Exponential backoff with full jitter on 429 / transient 5xx errors and on
+  connection failures and timeouts.
+- Single-flight coalescing: concurrent identical requests share one call.
+"""
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+INTERACTIVE = 0
+BULK = 1
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_MARKERS = ("RESOURCE_EXHAUSTED", "UNAVAILABLE")
+
+# Buckets are keyed by user-supplied API keys, so keep only the most recent ones.
+MAX_BUCKETS = 32
+
+# Requests per minute per model; override with GEMINI_RPM_<MODEL>, e.g.
+# GEMINI_RPM_GEMINI_2_5_FLASH=10. Unlisted models use GEMINI_RPM_DEFAULT.
+DEFAULT_RPM = {
+    "text-embedding-004": 1500,
+    "gemini-2.5-flash": 1000,
+}
+
+
+class RetriesExhausted(Exception):
+    """Raised when a call still fails after all retries; `status_code` is the HTTP status to report."""
+    status_code = 503
+
+
+class RateLimitExceeded(RetriesExhausted):
+    """The call was still rate limited (429) after all retries."""
+    status_code = 429
+
+
+class UpstreamUnavailable(RetriesExhausted):
+    """The call still hit server errors (5xx) after all retries."""
+    status_code = 503
+
+
+def _error_code(error: Exception):
+    return getattr(error, "code", None) or getattr(error, "status_code", None)
+
+
+@lru_cache(maxsize=1)
+def _transport_errors() -> tuple:
+    """Connection failures and timeouts, including httpx's (used by the Gemini SDK) when installed."""
+    errors = (TimeoutError, ConnectionError)
+    try:
+        import httpx
+    except ImportError:
+        return errors
+    return errors + (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if _error_code(error) in RETRYABLE_CODES or isinstance(error, _transport_errors()):
+        return True
+    message = str(error)
+    return any(marker in message for marker in RETRYABLE_MARKERS)
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    return _error_code(error) == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def _rpm_for(model: str) -> float:
+    env_name = "GEMINI_RPM_" + "".join(c if c.isalnum() else "_" for c in model).upper()
+    value = os.environ.get(env_name)
+    if value is None:
+        value = DEFAULT_RPM.get(model, os.environ.get("GEMINI_RPM_DEFAULT", 60))
+    return float(value)
+
+
+class TokenBucket:
+    """Token bucket whose waiters are released in (priority, arrival) order."""
+
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority: int = INTERACTIVE):
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == entry and self.tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate if self.tokens < 1 else None
+                    self._cond.wait(timeout=wait)
+            finally:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                # Let the next waiter re-check the head of the queue.
+                self._cond.notify_all()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class Scheduler:
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._flights: Dict[Any, _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0, "retries": 0, "rate_limited": 0, "unavailable": 0}
+
+    def _bucket(self, api_key: str, model: str) -> TokenBucket:
+        with self._lock:
+            key = (api_key, model)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate = _rpm_for(model) / 60.0
+                # Allow a short burst of up to ~1 second of quota (at least one call).
+                bucket = TokenBucket(rate, capacity=max(1.0, rate))
+                self._buckets[key] = bucket
+                if len(self._buckets) > MAX_BUCKETS:
+                    # Callers already waiting on an evicted bucket keep their reference.
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def call(
+        self,
+        api_key: str,
+        model: str,
+        fn: Callable[[], Any],
+        priority: int = INTERACTIVE,
+        coalesce_key: Optional[Any] = None,
+    ) -> Any:
+        """
+        Runs `fn` under the rate limit for (api_key, model), retrying transient
+        failures. Calls sharing a `coalesce_key` while one is in flight wait
+        for and return that call's result instead of issuing their own.
+        """
+        if coalesce_key is None:
+            return self._run(api_key, model, fn, priority)
+
+        key = (api_key, model, coalesce_key)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._run(api_key, model, fn, priority)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.result
+
+    def _run(self, api_key: str, model: str, fn: Callable[[], Any], priority: int) -> Any:
+        bucket = self._bucket(api_key, model)
+        attempt = 0
+        while True:
+            bucket.acquire(priority)
+            self._count("calls")
+            try:
+                return fn()
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                if attempt >= self.max_retries:
+                    if _is_rate_limit(e):
+                        self._count("rate_limited")
+                        raise RateLimitExceeded(f"{model} still rate limited after {attempt} retries: {e}") from e
+                    self._count("unavailable")
+                    raise UpstreamUnavailable(f"{model} still unavailable after {attempt} retries: {e}") from e
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                self._count("retries")
+                print(f"Retrying {model} call in {delay:.2f}s (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(delay)
+
+
+scheduler = Scheduler(
+    max_retries=int(os.environ.get("GEMINI_MAX_RETRIES", 5)),
+    base_delay=float(os.environ.get("GEMINI_RETRY_BASE_DELAY", 1.0)),
+    max_delay=float(os.environ.get("GEMINI_RETRY_MAX_DELAY", 30.0)),
+)
@@ -0,0 +1,167 @@
+"""
+Portable snapshots of the `qa_agent_docs` collection.
+
+A snapshot is a directory with:
+- vectors.npy     float32 matrix (one row per point), loadable with mmap
+- payloads.jsonl  one {"id": ..., "payload": {...}} object per row
+- manifest.json   format version, embedding backend, dimension and count
+
+Loading a snapshot bulk-upserts the precomputed vectors, so a fresh
+environment is ready without re-parsing or re-embedding any document.
+
+Usage:
+    python backend/snapshot.py export snapshots/qa_docs
+    python backend/snapshot.py import snapshots/qa_docs
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+from typing import Any, Dict, Optional
+
+import database
+import embeddings
+
+SNAPSHOT_VERSION = 1
+VECTORS_FILE = "vectors.npy"
+PAYLOADS_FILE = "payloads.jsonl"
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_FILES = (VECTORS_FILE, PAYLOADS_FILE, MANIFEST_FILE)
+
+
+def export_snapshot(path: str, url: Optional[str], api_key: Optional[str]) -> Dict[str, Any]:
+    """
+    Writes every point in the collection to a snapshot directory and returns its manifest.
+    The manifest's backend comes from the stored points, not from EMBEDDING_BACKEND;
+    raises ValueError if the points were embedded by different or unknown backends.
+    """
+    import numpy as np
+
+    backend = embeddings.get_backend()
+    os.makedirs(path, exist_ok=True)
+    rows = []
+    dim = 0
+    backend_names = set()
+    with open(os.path.join(path, PAYLOADS_FILE), "w", encoding="utf-8") as f:
+        for ids, vectors, payloads in database.export_points(url, api_key):
+            for point_id, vector, payload in zip(ids, vectors, payloads):
+                dim = dim or len(vector)
+                if "embedding_backend" not in payload:
+                    # Points ingested before the backend was recorded: only the
+                    # current backend is a plausible source, and only if the size fits.
+                    if dim != backend.dim:
+                        raise ValueError(
+                            f"Stored vectors have {dim} dims but EMBEDDING_BACKEND is '{backend.name}' "
+                            f"({backend.dim} dims); cannot tell which backend embedded them."
+                        )
+                    payload["embedding_backend"] = backend.name
+                payload.setdefault("content_hash", database.content_hash(payload.get("content", "")))
+                backend_names.add(payload["embedding_backend"])
+                f.write(json.dumps({"id": point_id, "payload": payload}) + "\n")
+                rows.append(vector)
+
+    if len(backend_names) > 1:
+        raise ValueError(f"Collection mixes vectors from several embedding backends: {', '.join(sorted(backend_names))}")
+
+    matrix = np.asarray(rows, dtype=np.float32).reshape(len(rows), dim)
+    np.save(os.path.join(path, VECTORS_FILE), matrix)
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "collection": database.COLLECTION_NAME,
+        "embedding_backend": backend_names.pop() if backend_names else backend.name,
+        "dim": dim,
+        "count": len(rows),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Exported {len(rows)} points to {path}")
+    return manifest
+
+
+def import_snapshot(path: str, url: Optional[str], api_key: Optional[str]) -> Dict[str, Any]:
+    """
+    Bulk-loads a snapshot directory into the collection and returns its manifest.
+    Raises ValueError if the snapshot was built with a different embedding backend.
+    """
+    import numpy as np
+
+    with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {manifest.get('version')}")
+
+    backend = embeddings.get_backend()
+    if manifest["count"] and (manifest["embedding_backend"] != backend.name or manifest["dim"] != backend.dim):
+        raise ValueError(
+            f"Snapshot was built with the '{manifest['embedding_backend']}' backend ({manifest['dim']} dims) "
+            f"but EMBEDDING_BACKEND is '{backend.name}' ({backend.dim} dims); queries would not match."
+        )
+
+    vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+    ids = []
+    payloads = []
+    with open(os.path.join(path, PAYLOADS_FILE), "r", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            ids.append(row["id"])
+            payloads.append(row["payload"])
+
+    if len(ids) != len(vectors):
+        raise ValueError(f"Snapshot is inconsistent: {len(ids)} payloads but {len(vectors)} vectors")
+
+    database.import_points(ids, vectors, payloads, url, api_key)
+    return manifest
+
+
+def export_archive(url: Optional[str], api_key: Optional[str]) -> bytes:
+    """Exports a snapshot as an uncompressed zip (the .npy stays mmap-able once extracted)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        export_snapshot(tmp, url, api_key)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for name in SNAPSHOT_FILES:
+                archive.write(os.path.join(tmp, name), arcname=name)
+        return buffer.getvalue()
+
+
+def import_archive(data: bytes, url: Optional[str], api_key: Optional[str]) -> Dict[str, Any]:
+    """Imports a snapshot zip produced by `export_archive`."""
+    if not zipfile.is_zipfile(io.BytesIO(data)):
+        raise ValueError("Snapshot upload is not a zip archive")
+    with tempfile.TemporaryDirectory() as tmp:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            missing = [name for name in SNAPSHOT_FILES if name not in archive.namelist()]
+            if missing:
+                raise ValueError(f"Snapshot archive is missing {', '.join(missing)}")
+            # Only the known files are extracted, never arbitrary archive paths.
+            for name in SNAPSHOT_FILES:
+                archive.extract(name, tmp)
+        return import_snapshot(tmp, url, api_key)
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Export or import qa_agent_docs snapshots.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot directory")
+    parser.add_argument("--qdrant-url", default=os.environ.get("QDRANT_URL"))
+    parser.add_argument("--qdrant-api-key", default=os.environ.get("QDRANT_API_KEY"))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "export":
+        manifest = export_snapshot(args.path, args.qdrant_url, args.qdrant_api_key)
+    else:
+        manifest = import_snapshot(args.path, args.qdrant_url, args.qdrant_api_key)
+    print(f"{args.command} of {manifest['count']} points took {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
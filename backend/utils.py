@@ -1,6 +1,8 @@
-from bs4 import BeautifulSoup
 import os
-import fitz  # PyMuPDF
+from typing import Any, Dict, List
+
+# bs4 and PyMuPDF (fitz) are imported inside the parsers that need them, so
+# importing this module does not pay for either library up front.
 
 def parse_file_content(file_path: str, content: bytes) -> str:
     """
@@ -12,6 +14,7 @@ def parse_file_content(file_path: str, content: bytes) -> str:
     ext = os.path.splitext(filename)[1].lower()
     
     if ext == '.html':
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(content, 'html.parser')
         # Remove scripts and styles for cleaner embedding
         for script in soup(["script", "style"]):
@@ -21,6 +24,8 @@ def parse_file_content(file_path: str, content: bytes) -> str:
     
     elif ext == '.pdf':
         try:
+            import fitz  # PyMuPDF
+
             # Open PDF from bytes
             pdf_document = fitz.open(stream=content, filetype="pdf")
             text = ""
@@ -48,6 +53,7 @@ def clean_html_for_llm(html_content: str) -> str:
     Preserves structure (IDs, classes, inputs) but removes scripts, styles, SVGs, and comments.
     """
     try:
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_content, 'html.parser')
         
         # Remove heavy tags that aren't needed for Selenium selectors
@@ -64,3 +70,17 @@ def clean_html_for_llm(html_content: str) -> str:
     except Exception as e:
         print(f"Error cleaning HTML: {e}")
         return html_content
+
+def warm_up_parsers():
+    """Imports the parsing libraries and runs a tiny parse so the first upload is fast."""
+    import fitz  # PyMuPDF
+    parse_file_content("warmup.html", b"<html><body><p>warm up</p></body></html>")
+    clean_html_for_llm("<html><body><p>warm up</p></body></html>")
+
+def format_context(documents: List[Dict[str, Any]]) -> str:
+    """Joins retrieved documents into a prompt context with a source header per document."""
+    context = ""
+    for doc in documents:
+        context += f"\n--- Source: {doc.get('filename', 'Unknown')} ---\n"
+        context += doc.get('content', '')
+    return context
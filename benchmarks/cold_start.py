@@ -0,0 +1,86 @@
+"""
+Measures backend cold start in a fresh interpreter: import time, lifespan
+startup, and the latency of the first and second /ingest request (using the
+fake Gemini client). Prints a single JSON object; `run.py` calls this in a
+subprocess so module caches from the main benchmark do not leak in.
+
+--prewarm selects the scenario:
+- off:    PREWARM_ON_STARTUP=false; the first request loads everything itself.
+- during: warm-up enabled and the first request is sent immediately, while
+          the warm-up thread is still running.
+- ready:  warm-up enabled and /health is polled until warm-up has finished
+          before the first request is timed.
+
+Usage:
+    python benchmarks/cold_start.py [--prewarm off|during|ready]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+_STARTED = time.perf_counter()
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "backend"))
+sys.path.insert(0, BENCH_DIR)
+
+
+PREWARM_MODES = ("off", "during", "ready")
+
+
+def wait_for_warm_up(client, timeout: float = 30.0) -> float:
+    """Polls /health until the server reports warm-up as finished; returns the wait in ms."""
+    started = time.perf_counter()
+    while client.get("/health").json()["startup"]["warmup_seconds"] is None:
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError(f"Warm-up did not finish within {timeout:.0f}s")
+        time.sleep(0.005)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend cold start.")
+    parser.add_argument("--prewarm", choices=PREWARM_MODES, default="off")
+    prewarm = parser.parse_args().prewarm
+    os.environ["QDRANT_URL"] = ""
+    os.environ["QDRANT_API_KEY"] = ""
+    os.environ["PREWARM_ON_STARTUP"] = "false" if prewarm == "off" else "true"
+
+    import main as backend_main
+    imported = time.perf_counter()
+
+    from fastapi.testclient import TestClient
+    from fake_genai import FakeGeminiConfig, FakeGenAIClient
+    import llm_service
+
+    fake = FakeGenAIClient(FakeGeminiConfig(embed_latency=0.0))
+    llm_service.get_client = lambda api_key: fake
+
+    files = [("files", ("cold_start.md", b"# Cold start\nPromo code SAVE15 grants 15% off.", "text/markdown"))]
+    headers = {"x-gemini-api-key": "bench-key"}
+
+    with TestClient(backend_main.app) as client:
+        started = time.perf_counter()
+        warmup_wait_ms = wait_for_warm_up(client) if prewarm == "ready" else 0.0
+        timings = []
+        for _ in range(2):
+            t = time.perf_counter()
+            client.post("/ingest", files=files, headers=headers).raise_for_status()
+            timings.append((time.perf_counter() - t) * 1000)
+        startup = client.get("/health").json()["startup"]
+
+    print(json.dumps({
+        "prewarm": prewarm,
+        "import_ms": (imported - _STARTED) * 1000,
+        "startup_ms": (started - _STARTED) * 1000,
+        "warmup_wait_ms": warmup_wait_ms,
+        "first_request_ms": timings[0],
+        "second_request_ms": timings[1],
+        "server_metrics": startup,
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Builds synthetic document corpora from the sample files in `assets/`.
+
+Every generated file is a variant of one of the samples with a unique marker
+added, so content (and therefore embeddings) differ between files.
+"""
+import json
+import os
+from typing import List, Tuple
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+
+
+def load_assets(assets_dir: str = ASSETS_DIR) -> List[Tuple[str, bytes]]:
+    """Returns (filename, content) pairs for every sample file."""
+    samples = []
+    for name in sorted(os.listdir(assets_dir)):
+        path = os.path.join(assets_dir, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                samples.append((name, f.read()))
+    return samples
+
+
+def _variant(filename: str, content: bytes, index: int, repeat: int) -> bytes:
+    stem, ext = os.path.splitext(filename)
+    marker = f"Synthetic variant {index} of {stem}"
+    text = content.decode("utf-8")
+
+    if ext == ".html":
+        body = text.split("</body>")[0] if "</body>" in text else text
+        extra = "".join(f"<p data-variant='{index}-{r}'>{marker} section {r}</p>" for r in range(repeat))
+        return (body + extra + "</body></html>").encode("utf-8")
+
+    if ext == ".json":
+        data = json.loads(text)
+        data["x-synthetic"] = {"variant": index, "copies": [marker] * repeat}
+        return json.dumps(data, indent=2).encode("utf-8")
+
+    return ("\n\n".join([text] * repeat) + f"\n\n{marker}\n").encode("utf-8")
+
+
+def build_corpus(num_files: int, repeat: int = 1, assets_dir: str = ASSETS_DIR) -> List[Tuple[str, bytes]]:
+    """
+    Returns `num_files` synthetic (filename, content) pairs cycling through the
+    samples. `repeat` multiplies each file's body to scale document size.
+    """
+    samples = load_assets(assets_dir)
+    if not samples:
+        raise ValueError(f"No sample files found in {assets_dir}")
+
+    corpus = []
+    for i in range(num_files):
+        filename, content = samples[i % len(samples)]
+        stem, ext = os.path.splitext(filename)
+        corpus.append((f"{stem}_{i:05d}{ext}", _variant(filename, content, i, max(1, repeat))))
+    return corpus
@@ -0,0 +1,122 @@
+"""
+Deterministic, offline stand-in for the parts of `google.genai.Client` used by
+the backend (`models.embed_content` and `models.generate_content`).
+
+Latency, output size and failure rate are configurable so benchmarks can
+exercise the API without spending real quota.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+EMBEDDING_DIM = 768
+
+
+@dataclass
+class FakeGeminiConfig:
+    embed_latency: float = 0.02           # seconds per embed_content call
+    generate_latency: float = 0.4         # base seconds per generate_content call
+    latency_per_1k_chars: float = 0.01    # extra seconds per 1000 prompt characters
+    latency_jitter: float = 0.1           # +/- fraction applied to every latency
+    output_tokens: int = 400              # approximate tokens in a generated script
+    test_cases_per_response: int = 5
+    failure_rate: float = 0.0             # probability a call raises a 429
+    seed: int = 1234
+
+
+class FakeAPIError(Exception):
+    """Mimics `google.genai.errors.APIError` closely enough for retry logic."""
+
+    def __init__(self, code: int, status: str, message: str):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+
+
+class _FakeModels:
+    def __init__(self, config: FakeGeminiConfig, stats: Dict[str, int], lock: threading.Lock):
+        self._config = config
+        self._stats = stats
+        self._lock = lock
+        self._rng = random.Random(config.seed)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] = self._stats.get(key, 0) + 1
+
+    def _sleep_and_maybe_fail(self, base: float):
+        with self._lock:
+            jitter = self._rng.uniform(-self._config.latency_jitter, self._config.latency_jitter)
+            fail = self._rng.random() < self._config.failure_rate
+        time.sleep(max(0.0, base * (1 + jitter)))
+        if fail:
+            self._count("failures")
+            raise FakeAPIError(429, "RESOURCE_EXHAUSTED", "Fake quota exceeded.")
+
+    def embed_content(self, model: str, contents: Any, config: Any = None):
+        self._count("embed_calls")
+        texts = contents if isinstance(contents, list) else [contents]
+        self._sleep_and_maybe_fail(self._config.embed_latency)
+        embeddings = [SimpleNamespace(values=fake_embedding(str(t))) for t in texts]
+        return SimpleNamespace(embeddings=embeddings)
+
+    def generate_content(self, model: str, contents: Any, config: Any = None):
+        self._count("generate_calls")
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        latency = self._config.generate_latency + self._config.latency_per_1k_chars * len(prompt) / 1000
+        self._sleep_and_maybe_fail(latency)
+
+        wants_json = getattr(config, "response_mime_type", None) == "application/json"
+        text = self._test_cases_json(prompt) if wants_json else self._script(prompt)
+        usage = SimpleNamespace(
+            prompt_token_count=len(prompt) // 4,
+            candidates_token_count=len(text) // 4,
+        )
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def _test_cases_json(self, prompt: str) -> str:
+        sources = sorted(set(re.findall(r"--- Source: (.+?) ---", prompt))) or ["product_specs.md"]
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:6]
+        cases = []
+        for i in range(self._config.test_cases_per_response):
+            source = sources[i % len(sources)]
+            cases.append({
+                "id": f"TC{i + 1:03d}",
+                "description": f"Verify behaviour {digest}-{i} described in {source}",
+                "steps": ["Open checkout page", f"Perform action {i}", "Observe the result"],
+                "expected_result": f"Outcome {i} matches {source}",
+                "grounded_in": source,
+            })
+        return json.dumps(cases)
+
+    def _script(self, prompt: str) -> str:
+        lines = ["import sys", "from selenium import webdriver", ""]
+        words_per_line = 8
+        for i in range(max(1, self._config.output_tokens // words_per_line)):
+            lines.append(f"print('step {i}: ' + 'token ' * {words_per_line - 3})")
+        return "\n".join(lines)
+
+
+class FakeGenAIClient:
+    """Drop-in replacement for `genai.Client(api_key=...)`."""
+
+    def __init__(self, config: FakeGeminiConfig = None):
+        self.config = config or FakeGeminiConfig()
+        self.stats: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.models = _FakeModels(self.config, self.stats, self._lock)
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """Deterministic unit-length pseudo-embedding derived from the text hash."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
@@ -0,0 +1,293 @@
+"""
+Offline benchmark for the QA Agent backend.
+
+Drives the FastAPI app in-process with a fake Gemini client and the in-memory
+Qdrant store, then reports throughput, latency percentiles and per-phase RSS for
+ingestion, vector search, test-case generation and script generation.
+
+Usage:
+    python benchmarks/run.py --files 200 --queries 50 --scripts 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(BENCH_DIR), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from corpus import ASSETS_DIR, build_corpus
+from fake_genai import FakeGeminiConfig, FakeGenAIClient
+
+QUERIES = [
+    "Test the checkout flow including promo code validation.",
+    "Verify shipping method selection updates the total.",
+    "Check form validation errors for the payment details.",
+    "Test adding and removing items from the cart.",
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile; returns 0.0 for an empty sample."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def process_peak_rss_mb() -> float:
+    """Lifetime high-water mark of the process; only ever increases. 0.0 where `resource` is unavailable (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> float:
+    """Current resident set size from /proc; falls back to the process peak (or 0.0) elsewhere."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return process_peak_rss_mb()
+
+
+class RssSampler:
+    """Samples current RSS in a background thread to find the peak within one phase."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_mb = current_rss_mb()
+        self.peak_mb = self.start_mb
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+def run_phase(name: str, jobs: List[Any], fn: Callable[[Any], int], concurrency: int) -> Dict[str, Any]:
+    """
+    Runs `fn` over `jobs` and collects per-job latency. `fn` returns the number
+    of items it processed (e.g. files per ingest request).
+    """
+    latencies: List[float] = []
+    errors = 0
+    items = 0
+
+    def timed(job):
+        started = time.perf_counter()
+        try:
+            return fn(job), time.perf_counter() - started, None
+        except Exception as e:
+            return 0, time.perf_counter() - started, e
+
+    started = time.perf_counter()
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for count, latency, error in pool.map(timed, jobs):
+            latencies.append(latency)
+            items += count
+            if error is not None:
+                errors += 1
+                print(f"[{name}] error: {error}")
+    elapsed = time.perf_counter() - started
+
+    return {
+        "phase": name,
+        "requests": len(jobs),
+        "items": items,
+        "errors": errors,
+        "seconds": elapsed,
+        "items_per_sec": items / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rss_peak_mb": rss.peak_mb,
+        "rss_delta_mb": rss.peak_mb - rss.start_mb,
+        "process_peak_rss_mb": process_peak_rss_mb(),
+    }
+
+
+def print_report(results: List[Dict[str, Any]]):
+    header = f"{'phase':<16}{'reqs':>6}{'items':>8}{'err':>5}{'items/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>9}{'+MB':>8}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['phase']:<16}{r['requests']:>6}{r['items']:>8}{r['errors']:>5}"
+            f"{r['items_per_sec']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['p99_ms']:>10.1f}{r['rss_peak_mb']:>9.1f}{r['rss_delta_mb']:>8.1f}"
+        )
+    print("peak MB: highest RSS sampled during the phase; +MB: peak minus RSS at phase start.")
+
+
+def measure_cold_start(prewarm: str) -> Dict[str, Any]:
+    """Runs cold_start.py in a fresh interpreter and returns its JSON report."""
+    cmd = [sys.executable, os.path.join(BENCH_DIR, "cold_start.py"), "--prewarm", prewarm]
+    output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the QA Agent backend.")
+    parser.add_argument("--files", type=int, default=100, help="Number of synthetic files to ingest")
+    parser.add_argument("--repeat", type=int, default=1, help="Body repetitions per file (scales file size)")
+    parser.add_argument("--batch-size", type=int, default=10, help="Files per /ingest request")
+    parser.add_argument("--queries", type=int, default=20, help="Number of search and /generate-tests requests")
+    parser.add_argument("--scripts", type=int, default=10, help="Number of /generate-script requests")
+    parser.add_argument("--mode", choices=["auto", "single", "map_reduce"], default="auto",
+                        help="Test generation mode sent to /generate-tests")
+    parser.add_argument("--top-k", type=int, default=3, help="Documents retrieved per /generate-tests request")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests per phase")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Fake embed latency in seconds")
+    parser.add_argument("--generate-latency", type=float, default=0.4, help="Fake generation base latency in seconds")
+    parser.add_argument("--latency-per-1k-chars", type=float, default=0.01, help="Extra fake latency per 1000 prompt chars")
+    parser.add_argument("--output-tokens", type=int, default=400, help="Approximate tokens per generated script")
+    parser.add_argument("--test-cases", type=int, default=5, help="Test cases per /generate-tests response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability that a fake call raises a 429")
+    parser.add_argument("--embedding-backend", choices=["gemini", "hashing"], default="gemini",
+                        help="Embedding backend (gemini uses the fake client, hashing runs locally)")
+    parser.add_argument("--rpm", type=int, default=60000, help="Scheduler requests-per-minute limit for each Gemini model")
+    parser.add_argument("--retry-base-delay", type=float, default=0.05, help="Scheduler backoff base delay in seconds")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--skip-cold-start", action="store_true", help="Skip the subprocess cold-start measurement")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    cold_start = []
+    if not args.skip_cold_start:
+        for prewarm in ("off", "during", "ready"):
+            report = measure_cold_start(prewarm)
+            cold_start.append(report)
+            print(
+                f"Cold start (prewarm={prewarm}): import {report['import_ms']:.0f}ms, "
+                f"startup {report['startup_ms']:.0f}ms, warm-up wait {report['warmup_wait_ms']:.0f}ms, "
+                f"first /ingest {report['first_request_ms']:.1f}ms, "
+                f"second /ingest {report['second_request_ms']:.1f}ms"
+            )
+
+    # Force the in-memory Qdrant store regardless of any local .env.
+    os.environ["QDRANT_URL"] = ""
+    os.environ["QDRANT_API_KEY"] = ""
+    os.environ["EMBEDDING_BACKEND"] = args.embedding_backend
+    os.environ["GEMINI_RETRY_BASE_DELAY"] = str(args.retry_base_delay)
+    for model_env in ("GEMINI_RPM_TEXT_EMBEDDING_004", "GEMINI_RPM_GEMINI_2_5_FLASH"):
+        os.environ[model_env] = str(args.rpm)
+
+    from fastapi.testclient import TestClient
+    import database
+    import embeddings
+    import llm_service
+    import main as backend_main
+    from scheduler import scheduler
+
+    fake = FakeGenAIClient(FakeGeminiConfig(
+        embed_latency=args.embed_latency,
+        generate_latency=args.generate_latency,
+        latency_per_1k_chars=args.latency_per_1k_chars,
+        output_tokens=args.output_tokens,
+        test_cases_per_response=args.test_cases,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    ))
+    llm_service.get_client = lambda api_key: fake
+
+    client = TestClient(backend_main.app)
+    headers = {"x-gemini-api-key": "bench-key"}
+    results = []
+
+    corpus = build_corpus(args.files, repeat=args.repeat)
+    batches = [corpus[i:i + args.batch_size] for i in range(0, len(corpus), args.batch_size)]
+
+    def ingest(batch):
+        files = [("files", (name, content, "application/octet-stream")) for name, content in batch]
+        response = client.post("/ingest", files=files, headers=headers)
+        response.raise_for_status()
+        return response.json()["files_processed"]
+
+    results.append(run_phase("ingest", batches, ingest, args.concurrency))
+
+    queries = [f"{QUERIES[i % len(QUERIES)]} (run {i})" for i in range(args.queries)]
+
+    def search(query):
+        vector = embeddings.get_backend().embed([query], "bench-key")[0]
+        database.search_documents(vector, None, None, limit=3)
+        return 1
+
+    results.append(run_phase("search", queries, search, args.concurrency))
+
+    generated: List[Dict[str, Any]] = []
+
+    def generate_tests(query):
+        payload = {"query": query, "mode": args.mode, "top_k": args.top_k}
+        response = client.post("/generate-tests", json=payload, headers=headers)
+        response.raise_for_status()
+        cases = response.json()["test_cases"]
+        generated.extend(cases)
+        return 1
+
+    results.append(run_phase("generate-tests", queries, generate_tests, args.concurrency))
+
+    with open(os.path.join(ASSETS_DIR, "checkout.html"), "r", encoding="utf-8") as f:
+        html_content = f.read()
+    fallback_case = {
+        "id": "TC001",
+        "description": "Verify promo code SAVE15 applies a discount",
+        "steps": ["Enter SAVE15", "Click Apply"],
+        "expected_result": "Discount is shown",
+        "grounded_in": "product_specs.md",
+    }
+    script_cases = [(generated[i % len(generated)] if generated else fallback_case) for i in range(args.scripts)]
+
+    def generate_script(test_case):
+        payload = {"test_case": test_case, "html_content": html_content}
+        response = client.post("/generate-script", json=payload, headers=headers)
+        response.raise_for_status()
+        return 1
+
+    results.append(run_phase("generate-script", script_cases, generate_script, args.concurrency))
+
+    print_report(results)
+    print(f"\nFake Gemini calls: {fake.stats}")
+    print(f"Scheduler: {scheduler.stats}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "args": vars(args),
+                "results": results,
+                "cold_start": cold_start,
+                "fake_calls": fake.stats,
+                "scheduler": scheduler.stats,
+            }, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import threading
 import json
 import os
 
+# (connect, read) timeouts in seconds; LLM-backed endpoints can take a while to respond.
+REQUEST_TIMEOUT = (
+    float(os.environ.get("BACKEND_CONNECT_TIMEOUT", 5)),
+    float(os.environ.get("BACKEND_READ_TIMEOUT", 300)),
+)
+MAX_PARALLEL_REQUESTS = int(os.environ.get("MAX_PARALLEL_REQUESTS", 4))
+CACHE_TTL_SECONDS = 3600
+
 # Page Config
 st.set_page_config(page_title="Autonomous QA Agent", layout="wide")
 st.title("🤖 Autonomous QA Agent")
@@ -17,9 +29,15 @@ gemini_api_key = st.sidebar.text_input("Gemini API Key", type="password", help="
 qdrant_url = st.sidebar.text_input("Qdrant URL", help="Optional: Defaults to memory if empty")
 qdrant_api_key = st.sidebar.text_input("Qdrant API Key", type="password", help="Optional: Required if using Qdrant Cloud")
 
+if st.sidebar.button("Clear Cached Results"):
+    st.cache_data.clear()
+    st.sidebar.success("Cache cleared.")
+
 # State Management
 if 'test_cases' not in st.session_state:
     st.session_state.test_cases = []
+if 'test_case_clusters' not in st.session_state:
+    st.session_state.test_case_clusters = {}
 if 'generated_scripts' not in st.session_state:
     st.session_state.generated_scripts = {}
 if 'html_content' not in st.session_state:
@@ -39,6 +57,104 @@ def get_headers():
         headers["x-qdrant-api-key"] = qdrant_api_key
     return headers
 
+class BackendError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"Error {status_code}: {text}")
+
+@st.cache_resource
+def get_http_session():
+    """One pooled, keep-alive session shared by every rerun and worker thread."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=MAX_PARALLEL_REQUESTS, pool_maxsize=MAX_PARALLEL_REQUESTS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+def post_json(url, headers, **kwargs):
+    response = get_http_session().post(url, headers=headers, timeout=REQUEST_TIMEOUT, **kwargs)
+    if response.status_code != 200:
+        raise BackendError(response.status_code, response.text)
+    return response.json()
+
+class _IncompleteResult(Exception):
+    """Carries a 200 response that reports a failure out of a cached function, so it is not cached."""
+    def __init__(self, result):
+        super().__init__("incomplete result")
+        self.result = result
+
+# Cached by (backend, inputs, credentials). Errors raise, and so do 200 responses
+# that only report a failure, so a retry always reaches the backend again.
+@st.cache_data(show_spinner=False, ttl=CACHE_TTL_SECONDS)
+def _fetch_test_cases_cached(backend_url, query, existing_test_cases, mode, top_k, headers):
+    payload = {"query": query, "existing_test_cases": existing_test_cases, "mode": mode, "top_k": top_k}
+    data = post_json(f"{backend_url}/generate-tests", headers, json=payload)
+    test_cases = data.get("test_cases", [])
+    clusters = data.get("clusters", {})
+    failed_groups = data.get("failed_groups", [])
+    # New cases either stay in the suite or show up as merged members of a cluster.
+    returned_ids = {tc.get("id") for tc in test_cases} | {m for members in clusters.values() for m in members}
+    added_nothing = returned_ids <= {tc.get("id") for tc in existing_test_cases}
+    if failed_groups or added_nothing:
+        raise _IncompleteResult((test_cases, clusters, failed_groups))
+    return test_cases, clusters, failed_groups
+
+def fetch_test_cases(backend_url, query, existing_test_cases, mode, top_k, headers):
+    """Returns the merged suite, the duplicate clusters and any failed map-reduce groups for `query`."""
+    try:
+        return _fetch_test_cases_cached(backend_url, query, existing_test_cases, mode, top_k, headers)
+    except _IncompleteResult as e:
+        return e.result
+
+@st.cache_data(show_spinner=False, ttl=CACHE_TTL_SECONDS)
+def fetch_script(backend_url, test_case, html_content, headers):
+    payload = {
+        "test_case": test_case,
+        "html_content": html_content
+    }
+    script_code = post_json(f"{backend_url}/generate-script", headers, json=payload).get("script_code")
+    # The backend reports generation failures as a commented script with status 200.
+    if not script_code or script_code.startswith("# Error generating script"):
+        raise BackendError(200, script_code or "Empty script returned")
+    return script_code
+
+@st.cache_data(show_spinner=False)
+def load_checkout_asset():
+    """Returns (path, content) for the bundled checkout.html, or (None, None)."""
+    paths_to_check = [
+        os.path.join("assets", "checkout.html"),
+        os.path.join("..", "assets", "checkout.html"),
+        os.path.join("qa_agent", "assets", "checkout.html"),
+        os.path.join("c:/Users/irish/OneDrive/Desktop/qa_agent/assets/checkout.html") # Absolute fallback
+    ]
+    for path in paths_to_check:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return path, f.read()
+    return None, None
+
+def fetch_scripts_concurrently(test_cases, html_content, headers, on_done=None):
+    """Fetches scripts for several test cases in parallel; returns {id: script or exception}."""
+    ctx = get_script_run_ctx()
+    results = {}
+    with ThreadPoolExecutor(
+        max_workers=MAX_PARALLEL_REQUESTS,
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    ) as pool:
+        futures = {
+            pool.submit(fetch_script, BACKEND_URL, tc, html_content, headers): tc['id']
+            for tc in test_cases
+        }
+        for future in as_completed(futures):
+            tc_id = futures[future]
+            try:
+                results[tc_id] = future.result()
+            except Exception as e:
+                results[tc_id] = e
+            if on_done:
+                on_done(len(results), len(futures))
+    return results
+
 # --- Tab 1: Ingestion ---
 with tab1:
     st.header("Ingest Documentation & Assets")
@@ -58,16 +174,13 @@ with tab1:
             
             try:
                 with st.spinner("Ingesting files and building knowledge base..."):
-                    response = requests.post(
-                        f"{BACKEND_URL}/ingest", 
-                        files=files,
-                        headers=get_headers()
-                    )
+                    data = post_json(f"{BACKEND_URL}/ingest", get_headers(), files=files)
                     
-                if response.status_code == 200:
-                    st.success(f"Success! {response.json().get('message')}")
-                else:
-                    st.error(f"Error {response.status_code}: {response.text}")
+                st.success(f"Success! {data.get('message')}")
+                if data.get('skipped_files'):
+                    st.warning(f"Skipped {len(data['skipped_files'])} file(s): {', '.join(data['skipped_files'])}")
+            except BackendError as e:
+                st.error(str(e))
             except Exception as e:
                 st.error(f"Connection Error: {e}")
         else:
@@ -80,26 +193,50 @@ with tab2:
     
     query = st.text_area("Describe what you want to test", value="Test the checkout flow including promo code validation.")
     
-    if st.button("Generate Test Cases"):
+    with st.expander("Generation settings"):
+        generation_mode = st.selectbox(
+            "Mode",
+            ["auto", "single", "map_reduce"],
+            help="map_reduce generates per document group in parallel; auto uses it for large contexts"
+        )
+        top_k = st.number_input("Documents to retrieve", min_value=1, max_value=50, value=3)
+
+    st.caption("New test cases are added to the session's suite; near-duplicates of existing ones are merged.")
+    plan_col1, plan_col2 = st.columns([1, 1])
+    with plan_col2:
+        if st.button("Reset Test Suite"):
+            st.session_state.test_cases = []
+            st.session_state.test_case_clusters = {}
+            st.session_state.generated_scripts = {}
+
+    with plan_col1:
+        generate_clicked = st.button("Generate Test Cases")
+
+    if generate_clicked:
         if query:
             try:
+                existing = st.session_state.test_cases
                 with st.spinner("Analyzing documentation and generating test cases..."):
-                    payload = {"query": query}
-                    response = requests.post(
-                        f"{BACKEND_URL}/generate-tests", 
-                        json=payload,
-                        headers=get_headers()
-                    )
+                    suite, clusters, failed_groups = fetch_test_cases(
+                        BACKEND_URL, query, existing, generation_mode, int(top_k), get_headers())
+                st.session_state.test_cases = suite
+                st.session_state.test_case_clusters = clusters
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    st.session_state.test_cases = data.get("test_cases", [])
-                    if not st.session_state.test_cases:
-                        st.warning("Generated 0 test cases. Please ensure you have **Ingested Files** in the first tab and that your API keys are correct.")
-                    else:
-                        st.success(f"Generated {len(st.session_state.test_cases)} test cases.")
+                if not st.session_state.test_cases:
+                    st.warning("Generated 0 test cases. Please ensure you have **Ingested Files** in the first tab and that your API keys are correct.")
                 else:
-                    st.error(f"Error {response.status_code}: {response.text}")
+                    merged = sum(len(members) - 1 for members in clusters.values())
+                    st.success(
+                        f"Suite has {len(suite)} test cases "
+                        f"({max(0, len(suite) - len(existing))} new, {merged} near-duplicates merged)."
+                    )
+                if failed_groups:
+                    st.warning(
+                        f"{len(failed_groups)} document group(s) produced no test cases; "
+                        f"their coverage is missing: {'; '.join(failed_groups)}"
+                    )
+            except BackendError as e:
+                st.error(str(e))
             except Exception as e:
                 st.error(f"Connection Error: {e}")
         else:
@@ -116,6 +253,9 @@ with tab2:
                 st.write(f"**Expected Result:** {tc.get('expected_result')}")
                 if tc.get('grounded_in'):
                     st.info(f"📄 **Grounded In:** {tc.get('grounded_in')}")
+                duplicates = [m for m in st.session_state.test_case_clusters.get(tc.get('id'), []) if m != tc.get('id')]
+                if duplicates:
+                    st.caption(f"Merged near-duplicates: {', '.join(duplicates)}")
 
 # --- Tab 3: Scripting ---
 with tab3:
@@ -136,23 +276,11 @@ with tab3:
         with col1:
             if st.button("Load 'checkout.html' Asset"):
                 try:
-                    paths_to_check = [
-                        os.path.join("assets", "checkout.html"),
-                        os.path.join("..", "assets", "checkout.html"),
-                        os.path.join("qa_agent", "assets", "checkout.html"),
-                        os.path.join("c:/Users/irish/OneDrive/Desktop/qa_agent/assets/checkout.html") # Absolute fallback
-                    ]
-                    
-                    found = False
-                    for path in paths_to_check:
-                        if os.path.exists(path):
-                            with open(path, "r", encoding="utf-8") as f:
-                                st.session_state.html_content = f.read()
-                                found = True
-                                st.success(f"Loaded from {path}")
-                                break
-                    
-                    if not found:
+                    path, content = load_checkout_asset()
+                    if path:
+                        st.session_state.html_content = content
+                        st.success(f"Loaded from {path}")
+                    else:
                         st.error("Could not find checkout.html locally. Please paste it manually.")
                         
                 except Exception as e:
@@ -171,27 +299,46 @@ with tab3:
             if html_content:
                 try:
                     with st.spinner("Generating Selenium script..."):
-                        payload = {
-                            "test_case": selected_tc,
-                            "html_content": html_content
-                        }
-                        response = requests.post(
-                            f"{BACKEND_URL}/generate-script", 
-                            json=payload,
-                            headers=get_headers()
-                        )
+                        script_code = fetch_script(BACKEND_URL, selected_tc, html_content, get_headers())
                     
-                    if response.status_code == 200:
-                        script_code = response.json().get("script_code")
-                        st.session_state.generated_scripts[selected_tc['id']] = script_code
-                        st.success("Script generated!")
-                    else:
-                        st.error(f"Error {response.status_code}: {response.text}")
+                    st.session_state.generated_scripts[selected_tc['id']] = script_code
+                    st.success("Script generated!")
+                except BackendError as e:
+                    st.error(str(e))
                 except Exception as e:
                     st.error(f"Connection Error: {e}")
             else:
                 st.warning("Please provide HTML content.")
 
+        with st.expander("Generate scripts for multiple test cases"):
+            batch_options = st.multiselect(
+                "Test cases",
+                list(tc_options.keys()),
+                default=list(tc_options.keys())
+            )
+            if st.button("Generate Selected Scripts"):
+                if html_content and batch_options:
+                    progress = st.progress(0.0, text="Generating Selenium scripts...")
+                    results = fetch_scripts_concurrently(
+                        [tc_options[option] for option in batch_options],
+                        html_content,
+                        get_headers(),
+                        on_done=lambda done, total: progress.progress(done / total, text=f"Generated {done}/{total} scripts")
+                    )
+                    failures = []
+                    for tc_id, result in results.items():
+                        if isinstance(result, Exception):
+                            failures.append(f"{tc_id}: {result}")
+                        else:
+                            st.session_state.generated_scripts[tc_id] = result
+                    st.success(f"Generated {len(results) - len(failures)} of {len(results)} scripts. Select a test case above to view it.")
+                    for failure in failures:
+                        st.error(failure)
+                elif not html_content:
+                    st.warning("Please provide HTML content.")
+                else:
+                    st.warning("Please select at least one test case.")
+
         # Display Script
         if selected_tc['id'] in st.session_state.generated_scripts:
             st.subheader("Generated Python Script")